@@ -2,6 +2,7 @@
 
 import xmldestroyer as xd
 import xml.etree.cElementTree as ET
+import io
 import os
 import six
 import codecs
@@ -10,6 +11,7 @@ import xmltodict
 from collections import OrderedDict, defaultdict
 
 from nose.tools import eq_, with_setup
+from nose.plugins.skip import SkipTest
 
 
 def po_str_iter(actions, expected):
@@ -169,3 +171,237 @@ def test_xml_to_dict():
     out = next(my_xml_to_dict('test_data/po.xml'))
     with codecs.open('test_data/po.xml', 'r', encoding='utf-8') as f:
         eq_(out, xmltodict.parse(f.read()))
+
+
+def test_spill_threshold():
+    def purchaseOrder(children):
+        eq_(type(children), xd.SpilledChildren)
+        eq_(children[1], 'Robert Smith')
+        eq_(children[-1], '926-AA')
+        eq_(list(children), list(children))
+        return ','.join(children)
+
+    def name(text):
+        return text
+
+    def item(partNum):
+        return partNum
+
+    out = next(xd.iterate('test_data/po.xml', depth=0, spill_threshold=2,
+                          purchaseOrder=purchaseOrder, name=name, item=item))
+    eq_(out, 'Alice Smith,Robert Smith,872-AA,926-AA')
+
+
+def test_spill_threshold_returned_children():
+    data = b'<r>' + b'<s>' + b'<w>word</w>' * 10 + b'</s>' + b'</r>'
+
+    def w(text):
+        return text
+
+    def s(children):
+        return children
+
+    def r(children):
+        return [list(c) for c in children]
+
+    out = list(xd.iterate(io.BytesIO(data), depth=0, spill_threshold=3,
+                          w=w, s=s, r=r))
+    eq_(out, [[['word'] * 10]])
+
+    out = list(xd.iterate(io.BytesIO(data), depth=1, spill_threshold=3,
+                          w=w, s=s))
+    eq_(type(out[0]), xd.SpilledChildren)
+    eq_(list(out[0]), ['word'] * 10)
+
+
+def __spill_peak_memory(n):
+    import tracemalloc
+    data = b'<r>' + b'<s><w>word</w></s>' * n + b'</r>'
+
+    def w(text):
+        return text
+
+    def s(children):
+        return children[0]
+
+    def r(children):
+        return sum(1 for _ in children)
+
+    tracemalloc.start()
+    try:
+        out = list(xd.iterate(io.BytesIO(data), depth=0, spill_threshold=100,
+                              w=w, s=s, r=r))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    eq_(out, [n])
+    return peak
+
+
+def test_spill_threshold_bounded_memory():
+    try:
+        import tracemalloc
+    except ImportError:
+        raise SkipTest('tracemalloc is not available')
+    small = __spill_peak_memory(2000)
+    large = __spill_peak_memory(16000)
+    assert large < 1.5 * small, (small, large)
+
+
+NAMESPACES = {'tei': 'http://www.tei-c.org/ns/1.0',
+              'x': 'http://example.com/x'}
+
+
+def test_namespaces_prefixed():
+    def w(text):
+        return text
+
+    out = list(xd.iterate('test_data/ns.xml', {'tei:w': w},
+                          depth=2, namespaces=NAMESPACES))
+    eq_(out, ['The', 'lawn'])
+
+
+def test_namespaces_local_name():
+    def w(text, pos):
+        return text + '/' + pos
+
+    def s(children):
+        return ' '.join(children)
+
+    out = list(xd.iterate('test_data/ns.xml', w=w, s=s, namespaces={}))
+    eq_(out, ['The/DT lawn/NN grows/VB'])
+
+
+def test_namespaces_most_specific():
+    def w(text):
+        return text
+
+    def x_w(text):
+        return text.upper()
+
+    out = list(xd.iterate('test_data/ns.xml', {'w': w, 'x:w': x_w},
+                          depth=2, namespaces=NAMESPACES))
+    eq_(out, ['The', 'lawn', 'GROWS'])
+
+
+def test_namespaces_prefix_without_map():
+    def w(text):
+        return text
+
+    for namespaces in [None, {'x': 'http://example.com/x'}]:
+        try:
+            list(xd.iterate('test_data/ns.xml', {'tei:w': w},
+                            namespaces=namespaces))
+        except ValueError:
+            pass
+        else:
+            assert False, namespaces
+
+
+def test_namespaces_clark_notation():
+    def w(text):
+        return text
+
+    out = list(xd.iterate('test_data/ns.xml', {'{http://example.com/x}w': w},
+                          depth=2))
+    eq_(out, ['grows'])
+
+
+def test_extract_field():
+    out = '\n'.join(xd.iterate('test_data/po.xml', extract={'name': 'text'}))
+    eq_(out, 'Alice Smith\nRobert Smith')
+
+
+def test_extract_tuple_and_dict():
+    out = list(xd.iterate('test_data/po.xml', depth=0, extract={
+        'name': ('text', '@missing'),
+        'item': {'part': '@partNum', 'tag': 'tag'}}))
+    eq_(out, [('Alice Smith', None), ('Robert Smith', None),
+              {'part': '872-AA', 'tag': 'item'},
+              {'part': '926-AA', 'tag': 'item'}])
+
+
+def test_extract_with_actions():
+    def s(children):
+        return ' '.join(w + '/' + pos for w, pos in children)
+
+    out = list(xd.iterate('test_data/ns.xml', s=s, namespaces={},
+                          extract={'w': ('text', '@pos')}))
+    eq_(out, ['The/DT lawn/NN grows/VB'])
+
+
+def test_extract_with_parent_action():
+    def productName(text, parent):
+        return text + ',' + parent.partNum
+
+    out = list(xd.iterate('test_data/po.xml', depth=2,
+                          productName=productName,
+                          extract={'item': '@partNum', 'name': 'text'}))
+    eq_(out, ['Alice Smith', 'Robert Smith',
+              'Lawnmower,872-AA', '872-AA', 'Baby Monitor,926-AA', '926-AA'])
+
+
+def test_internal_extract_builds_no_elements():
+    # Internal: extracted tags should not build an Element wrapper
+    created = []
+    original = xd.Element
+
+    class CountingElement(original):
+        def __init__(self, elem, trail):
+            created.append(elem.tag)
+            original.__init__(self, elem, trail)
+
+    xd.Element = CountingElement
+    try:
+        list(xd.iterate('test_data/po.xml', extract={'name': 'text'}))
+    finally:
+        xd.Element = original
+    eq_(created.count('name'), 0)
+
+
+def test_extract_namespaced_attribute():
+    lemma = ('@x:lemma', '@{http://example.com/x}lemma')
+    out = list(xd.iterate('test_data/ns.xml', depth=2, namespaces=NAMESPACES,
+                          extract={'x:w': lemma}))
+    eq_(out, [('grow', 'grow')])
+
+
+def test_extract_missing_attribute():
+    out = list(xd.iterate('test_data/ns.xml', depth=2, namespaces=NAMESPACES,
+                          extract={'w': '@x:lemma'}))
+    eq_(out, ['', '', 'grow'])
+    out = list(xd.iterate('test_data/ns.xml', depth=2, namespaces=NAMESPACES,
+                          extract={'w': ('@x:lemma',)}))
+    eq_(out, [(None,), (None,), ('grow',)])
+
+
+def test_extract_prefix_without_map():
+    try:
+        list(xd.iterate('test_data/ns.xml', extract={'s': '@x:lemma'}))
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_extract_and_action_on_same_tag():
+    def w(text):
+        return text
+
+    try:
+        list(xd.iterate('test_data/ns.xml', {'tei:w': w}, depth=2,
+                        namespaces=NAMESPACES, extract={'w': 'text'}))
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_extract_invalid_field():
+    for spec in [(None,), 'children', {'a': 3}]:
+        try:
+            list(xd.iterate('test_data/po.xml', extract={'name': spec}))
+        except ValueError:
+            pass
+        else:
+            assert False, spec
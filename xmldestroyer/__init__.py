@@ -12,8 +12,10 @@ import gzip
 import itertools
 import json
 import inspect
+import tempfile
 from contextlib import contextmanager
 from functools import wraps
+from six.moves import cPickle as pickle
 
 
 def Tag(tag, text, *children, **attribs):
@@ -76,12 +78,68 @@ class Element(object):
         raise AttributeError("Immutable object")
 
 
+class SpilledChildren(object):
+
+    """
+    A sequence of processed children stored in a temporary file instead of
+    in memory.  It is passed as ``children`` in place of a list when the
+    number of children exceeds ``spill_threshold`` (see
+    `xmldestroyer.iterate`).
+
+    It can be iterated over many times, has a length and supports indexing,
+    but indexing reads the file from the start.  The items are pickled, so
+    they must be picklable.  The file is removed when the object is closed
+    or garbage collected.
+    """
+
+    def __init__(self, items=()):
+        self._file = tempfile.TemporaryFile()
+        self._len = 0
+        for x in items:
+            self.append(x)
+
+    def append(self, x):
+        self._file.seek(0, 2)
+        pickle.dump(x, self._file, pickle.HIGHEST_PROTOCOL)
+        self._len += 1
+
+    def close(self):
+        self._file.close()
+
+    def __iter__(self):
+        pos = 0
+        for _ in six.moves.range(self._len):
+            # seek every time so that nested iterations do not interfere
+            self._file.seek(pos)
+            x = pickle.load(self._file)
+            pos = self._file.tell()
+            yield x
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('SpilledChildren index out of range')
+        return next(itertools.islice(self, i, None))
+
+    def __repr__(self):
+        return '<SpilledChildren of length ' + str(self._len) + '>'
+
+
 def iterate(input,
             actions={},
             default_action=None,
             input_compression='ext',
             depth=1,
             parameter_puns=True,
+            spill_threshold=None,
+            namespaces=None,
+            extract={},
             **more_actions):
     """
     Transforms an XML document bottom-up, returning an iterator of the results.
@@ -118,6 +176,40 @@ def iterate(input,
         No actions are executed before this depth.
     parameter_puns : boolean
         Default is True. See documentation for the 'actions' parameter.
+    spill_threshold : int
+        If this is given, a tag collecting more processed children than this
+        stores them in a temporary file, and its action gets them as a
+        'xmldestroyer.SpilledChildren' instead of a list.  This keeps memory
+        bounded when an action sits on a huge tag, such as the root with
+        ``depth=0``.  The children must then be picklable.
+        Default is None: all children are kept in memory.
+    namespaces : dictionary
+        A map from prefixes to namespace URIs.  If this is given, actions for
+        namespaced tags can also be keyed as ``'prefix:tag'`` or by the local
+        tag name only, not just in Clark notation as ``'{uri}tag'``.
+        The most specific key is used.  A ``'prefix:tag'`` key with a prefix
+        that is not in this map raises ValueError.  Give an empty dictionary
+        to only enable local tag names.  The ``tag`` of the
+        'xmldestroyer.Element' is still in Clark notation.
+    extract : dictionary
+        Fields to extract from tags without calling a Python function.
+        Keys are tag names, as for ``actions``, and values are specs:
+
+        - a field: the result is the field's value
+        - a tuple or list of fields: the result is a tuple of their values
+        - a dictionary from names to fields: the result is a dictionary
+
+        A field is ``'text'``, ``'tail'``, ``'tag'`` or ``'@name'`` for the
+        attribute ``name``.  A missing attribute is None in tuples and
+        dictionaries, and ``''`` when it is the only field.  Namespaced
+        attributes are given as ``'@prefix:name'`` using ``namespaces``,
+        or in Clark notation as ``'@{uri}name'``.
+        The results are passed on like the results from actions.
+        It is an error if a tag is matched by keys in both ``actions`` and
+        ``extract``, also through ``namespaces``.
+        Tags handled by ``extract`` do not collect processed children:
+        results from tags below them are passed to the nearest parent
+        with an action.
     **more_actions : dictionary
         Works the same as the ``actions`` dictionary.
     """
@@ -129,32 +221,64 @@ def iterate(input,
         if default_action:
             default_action = __parameter_puns_decorator(default_action)
 
-    def has_action(tag):
-        return tag in actions or default_action
+    extractors = {k: __compile_extractor(v, namespaces)
+                  for k, v in six.iteritems(extract)}
+    dispatch = __DispatchTable(actions, extractors, default_action, namespaces)
+
+    def push(x):
+        stk = stks[-1]
+        if (spill_threshold is not None and type(stk) == list and
+                len(stk) >= spill_threshold):
+            stk = stks[-1] = SpilledChildren(stk)
+        stk.append(x)
+
+    def build_trail():
+        for i, element in enumerate(trail):
+            if element is None:
+                trail[i] = Element(elems[i], trail[:i][::-1])
 
     stks = []
     trail = []
+    elems = []
     with __compressed_open(input, 'r', input_compression) as f:
         context = iter(ET.iterparse(f, events=("start", "end")))
         for evt, elem in context:
             if evt == 'start':
-                trail.append(Element(elem, trail[::-1]))
-                if len(trail) > depth and has_action(elem.tag):
+                elems.append(elem)
+                entry = dispatch[elem.tag]
+                if entry and entry[1]:
+                    # extracted tags only get an Element if a descendant
+                    # needs it in its trail
+                    trail.append(None)
+                else:
+                    if None in trail:
+                        build_trail()
+                    trail.append(Element(elem, trail[::-1]))
+                if len(trail) > depth and entry and entry[0]:
                     stks.append([])
             elif evt == 'end':
                 element = trail.pop()
-                if len(trail) >= depth and has_action(elem.tag):
-                    element._finalize(elem.text, elem.tail, stks.pop())
-                    res = actions.get(elem.tag, default_action)(element)
-                    if not inspect.isgenerator(res):
-                        res = (res,)
+                elems.pop()
+                entry = dispatch[elem.tag]
+                if len(trail) >= depth and entry:
+                    action, extractor = entry
+                    if extractor:
+                        res = (extractor(elem),)
+                    else:
+                        element._finalize(elem.text, elem.tail, stks.pop())
+                        res = action(element)
+                        if not inspect.isgenerator(res):
+                            res = (res,)
                     for x in res:
                         if x is not None:
                             if len(stks) > 0:
-                                stks[-1].append(x)
+                                push(x)
                             else:
                                 yield x
                 elem.clear()
+                # detach it so that the parsed tree does not grow
+                if elems:
+                    elems[-1].remove(elem)
 
 
 def write_iterator(iterator, output,
@@ -289,6 +413,55 @@ xd.__doc__ += __parameters(iterate) + __parameters(write_iterator)
 # Utilities
 
 
+class __DispatchTable(dict):
+
+    """
+    Maps raw tag names from the parser to an ``(action, extractor)`` pair,
+    where one of them is None, or to None if the tag is not handled.
+    Each tag name is resolved once on first lookup and then memoized.
+    """
+
+    def __init__(self, actions, extractors, default_action, namespaces):
+        both = set(actions) & set(extractors)
+        if both:
+            raise ValueError('Tags in both actions and extract: ' +
+                             ', '.join(sorted(both)))
+        self.actions = {k: (v, None) for k, v in six.iteritems(actions)}
+        self.actions.update((k, (None, v))
+                            for k, v in six.iteritems(extractors))
+        self.default_action = default_action and (default_action, None)
+        known = namespaces or {}
+        self.prefixes = {}
+        for prefix, uri in six.iteritems(known):
+            if prefix:
+                self.prefixes.setdefault(uri, []).append(prefix)
+        for k in self.actions:
+            prefix, sep, _ = k.partition(':')
+            if sep and not k.startswith('{') and prefix not in known:
+                raise ValueError('Unknown namespace prefix in: ' + k)
+        self.namespaces = namespaces
+
+    def __missing__(self, tag):
+        self[tag] = action = self.resolve(tag) or self.default_action
+        return action
+
+    def resolve(self, tag):
+        keys = [tag]
+        if self.namespaces is not None and tag.startswith('{'):
+            uri, _, local = tag[1:].partition('}')
+            keys.extend(prefix + ':' + local
+                        for prefix in self.prefixes.get(uri, []))
+            keys.append(local)
+        keys = [k for k in keys if k in self.actions]
+        if not keys:
+            return None
+        kinds = set(self.actions[k][0] is None for k in keys)
+        if len(kinds) > 1:
+            raise ValueError('Tag matched by both actions and extract: ' +
+                             tag + ' (' + ', '.join(keys) + ')')
+        return self.actions[keys[0]]
+
+
 def __compressed_open(filename, mode, compression='ext'):
     if hasattr(filename, 'read') or hasattr(filename, 'write'):
         @contextmanager
@@ -338,6 +511,41 @@ def __args_of(f):
     return inspect.getargspec(f).args
 
 
+def __compile_field(field, namespaces, missing=None):
+    if not isinstance(field, six.string_types):
+        raise ValueError('Invalid extraction field: ' + repr(field))
+    elif field in ('text', 'tail'):
+        return lambda elem: getattr(elem, field) or ''
+    elif field == 'tag':
+        return lambda elem: elem.tag
+    elif field.startswith('@'):
+        name = field[1:]
+        prefix, sep, local = name.partition(':')
+        if sep and not name.startswith('{'):
+            uris = {'xml': 'http://www.w3.org/XML/1998/namespace'}
+            uris.update(namespaces or {})
+            if prefix not in uris:
+                raise ValueError('Unknown namespace prefix in: ' + field)
+            name = '{' + uris[prefix] + '}' + local
+        return lambda elem: elem.attrib.get(name, missing)
+    else:
+        raise ValueError('Invalid extraction field: ' + repr(field))
+
+
+def __compile_extractor(spec, namespaces):
+    if isinstance(spec, six.string_types):
+        return __compile_field(spec, namespaces, missing='')
+    elif isinstance(spec, dict):
+        fields = [(k, __compile_field(v, namespaces))
+                  for k, v in six.iteritems(spec)]
+        return lambda elem: {k: f(elem) for k, f in fields}
+    elif isinstance(spec, (tuple, list)):
+        fields = [__compile_field(v, namespaces) for v in spec]
+        return lambda elem: tuple([f(elem) for f in fields])
+    else:
+        raise TypeError('Invalid extraction spec: ' + repr(spec))
+
+
 def __parameter_puns_decorator(f):
     if not inspect.isfunction(f):
         raise TypeError('Not a function: ' + repr(f))